@@ -3,18 +3,66 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import math
+import matplotlib
+matplotlib.use("Agg")  # Render off-screen; no GUI backend on the server
 import matplotlib.pyplot as plt
 import io
-from PIL import Image
-from fpdf import FPDF
-import tempfile
 import os
+from PIL import Image
+from fpdf import FPDF, XPos, YPos
+from functools import lru_cache
+from hashlib import blake2b
+
+# Numba is optional; without it the sweep kernel runs as plain NumPy
+try:
+    from numba import njit
+except ImportError:
+    def njit(**kwargs):
+        return lambda f: f
 
 # Constants
 GRAVITY = 980  # cm/s²
 K_DEFAULT = 2.5  # Loss coefficient
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logo.png")
+
+# Unicode TTF fonts bundled with matplotlib; the PDF core fonts only cover latin-1 (no Δ, α, μ)
+PDF_FONT_DIR = os.path.join(matplotlib.get_data_path(), "fonts", "ttf")
+PDF_FONT = "DejaVu"
+
+# Unit conversions
+_PI_OVER_4 = math.pi / 4
+_MM2_TO_M2 = 1e-6
+_M3HR_TO_CM_S_FACTOR = 100 / 3600  # m³/hr over an area in m² -> cm/s
+
+# Decimals shown in the reports; calculations keep full precision
+RESULT_DECIMALS = {
+    "Screen Area (m²)": 6,
+    "Free Flow Ratio (Clean)": 3,
+    "Free Flow Ratio (50% Clogged)": 3,
+    "Velocity (Clean)": 3,
+    "Velocity (Clogged)": 3,
+    "ΔP (Clean) [mbar]": 2,
+    "ΔP (50% Clogged) [mbar]": 2,
+}
+
+# Abbreviations listed at the end of the PDF report
+ABBREVIATIONS = """
+ΔP - Pressure drop
+Re - Reynolds No.
+C - Coefficient of discharge (From Perry page no. 5-40)
+V - Superficial Velocity of fluid based upon the gross area of the screen m/sec
+α - Effective opening area
+D - Opening width (mm)
+g - Gravitational force (m/s²)
+Q - % opening in wire mesh
+p - Density of media in kg/m³
+P - % opening in perforated sheet
+μ - Viscosity of media in cP
+K - Velocity Head Loss (From Miller, D.S.-Internal Flow Systems)
+"""
 
 # Calculate screen area
+@lru_cache(maxsize=256)
 def calculate_screen_area(strainer_type, od_mm, length_mm, height_mm=None):
     od = od_mm / 1000
     length = length_mm / 1000
@@ -26,130 +74,199 @@ def calculate_screen_area(strainer_type, od_mm, length_mm, height_mm=None):
         return math.pi * r * math.sqrt(r**2 + h**2)
     return 0
 
+# Velocity head coefficient, so that dP [mbar] = C * V[cm/s]²; works on floats and NumPy arrays
+def _dp_coefficient(rho, K):
+    return K * rho * 0.980665 / (2.0 * GRAVITY * 1000.0)
+
 # Calculate pressure drop
+@lru_cache(maxsize=256)
 def pressure_drop(A_pipe, A_screen, flow_m3_hr, rho, K):
-    flow_m3_s = flow_m3_hr / 3600
-    V_clean = flow_m3_s / A_screen
-    V_clogged = flow_m3_s / (A_screen / 2)
+    V_cm_s = flow_m3_hr * _M3HR_TO_CM_S_FACTOR / A_screen
+    V_clean = V_cm_s / 100
+    V_clogged = 2 * V_clean
+
+    dP_clean = _dp_coefficient(rho, K) * V_cm_s * V_cm_s
+    dP_clogged = 4 * dP_clean
+
+    return V_clean, V_clogged, dP_clean, dP_clogged
+
+# Clean pressure drop over an array of flowrates
+@njit(cache=True, fastmath=True)
+def _pdrop_kernel(A_screen, flow_arr, C):
+    # Cast the float64 constant so Numba keeps the sweep in the input precision
+    V_cm_s = flow_arr * flow_arr.dtype.type(_M3HR_TO_CM_S_FACTOR) / A_screen
+    return C * V_cm_s * V_cm_s
+
+# Build Excel report
+@st.cache_data
+def build_excel_bytes(cases_key):
+    df = pd.DataFrame([dict(c) for c in cases_key])
+    excel_buffer = io.BytesIO()
+    with pd.ExcelWriter(excel_buffer, engine='xlsxwriter') as writer:
+        df.to_excel(writer, index=False, sheet_name="Results")
+    return excel_buffer.getvalue()
+
+# Render flow vs pressure drop graph
+@st.cache_data
+def render_plot_png(plot_key):
+    # float32 is ample for plotting and halves the memory traffic of the sweep
+    flow_range = np.linspace(1, 20, 40, dtype=np.float32)
+    # One (num_cases, num_flows) sweep: cases along rows, flowrates along columns
+    A_arr, rho_arr, K_arr = (np.array(col, dtype=np.float32)[:, None] for col in plot_key)
+    dp_values = _pdrop_kernel(A_arr, flow_range[None, :], _dp_coefficient(rho_arr, K_arr))
+    fig, ax = plt.subplots()
+    for idx, dp_row in enumerate(dp_values):
+        ax.plot(flow_range, dp_row, label=f"Case {idx+1}")
+    ax.set_xlabel("Flowrate (m³/hr)")
+    ax.set_ylabel("Pressure Drop (mbar)")
+    ax.set_title("Flow vs Pressure Drop")
+    ax.grid(True)
+    ax.legend()
+    graph_buffer = io.BytesIO()
+    fig.savefig(graph_buffer, format="png", dpi=100)
+    plt.close(fig)
+    return graph_buffer.getvalue()
+
+# Read report logo once per server process
+@st.cache_resource
+def _load_logo_bytes():
+    with open(LOGO_PATH, "rb") as f:
+        return f.read()
 
-    dP_clean = (K * (rho / 1000) * (V_clean * 100) ** 2) / (2 * GRAVITY) * 0.980665
-    dP_clogged = (K * (rho / 1000) * (V_clogged * 100) ** 2) / (2 * GRAVITY) * 0.980665
+# PDF fonts
+def _pdf_font_path(filename):
+    path = os.path.join(PDF_FONT_DIR, filename)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"PDF font {filename} not found in {PDF_FONT_DIR}; it is expected to ship with matplotlib")
+    return path
 
-    return round(V_clean, 3), round(V_clogged, 3), round(dP_clean, 2), round(dP_clogged, 2)
+def _heading_font(pdf, size=12):
+    pdf.set_font(PDF_FONT, 'B', size)
+
+def _body_font(pdf):
+    pdf.set_font(PDF_FONT, '', 10)
 
 # Generate PDF report
-def generate_pdf(data, graph_img_path):
+@st.cache_data
+def generate_pdf(data, graph_png):
     pdf = FPDF()
+    pdf.add_font(PDF_FONT, '', _pdf_font_path("DejaVuSans.ttf"))
+    pdf.add_font(PDF_FONT, 'B', _pdf_font_path("DejaVuSans-Bold.ttf"))
     pdf.add_page()
-    logo_path = "pressure_drop_calculator/logo.png"
-    pdf.image(logo_path, x=10, y=8, w=40)
+    pdf.image(io.BytesIO(_load_logo_bytes()), x=10, y=8, w=40)
     pdf.ln(25)
-    pdf.set_font("Arial", 'B', 14)
-    pdf.cell(200, 10, txt="STRAINER PRESSURE DROP CALCULATION", ln=True, align='C')
+    _heading_font(pdf, 14)
+    pdf.cell(200, 10, text="STRAINER PRESSURE DROP CALCULATION", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
     pdf.ln(5)
-    pdf.set_font("Arial", '', 10)
+    _body_font(pdf)
 
     for idx, d in enumerate(data):
-        pdf.set_font("Arial", 'B', 12)
-        pdf.cell(200, 8, txt=f"CASE {idx + 1}", ln=True)
-        pdf.set_font("Arial", '', 10)
-        for k, v in d.items():
-            pdf.cell(100, 8, txt=f"{k}: {v}", ln=True)
+        _heading_font(pdf)
+        pdf.cell(200, 8, text=f"CASE {idx + 1}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        _body_font(pdf)
+        pdf.multi_cell(0, 8, text="\n".join(f"{k}: {v}" for k, v in d))
         pdf.ln(3)
 
-    pdf.image(graph_img_path, x=10, w=180)
+    pdf.image(io.BytesIO(graph_png), x=10, w=180)
     pdf.ln(5)
 
     # Add abbreviations
-    pdf.set_font("Arial", 'B', 12)
-    pdf.cell(200, 10, txt="Abbreviations Used", ln=True)
-    pdf.set_font("Arial", '', 10)
-    pdf.multi_cell(0, 8, txt="""
-ΔP - Pressure drop
-Re - Reynolds No.
-C - Coefficient of discharge (From Perry page no. 5-40)
-V - Superficial Velocity of fluid based upon the gross area of the screen m/sec
-α - Effective opening area
-D - Opening width (mm)
-g - Gravitational force (m/s²)
-Q - % opening in wire mesh
-p - Density of media in kg/m³
-P - % opening in perforated sheet
-μ - Viscosity of media in cP
-K - Velocity Head Loss (From Miller, D.S.-Internal Flow Systems)
-""")
+    _heading_font(pdf)
+    pdf.cell(200, 10, text="Abbreviations Used", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    _body_font(pdf)
+    pdf.multi_cell(0, 8, text=ABBREVIATIONS)
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as f:
-        pdf.output(f.name)
-        return f.name
+    return bytes(pdf.output())
 
 # Streamlit UI
 st.title("Strainer Pressure Drop Calculator")
 num_cases = st.selectbox("Number of Cases", [1, 2], index=1)
-cases = []
-
-for i in range(num_cases):
-    with st.expander(f"Case {i+1} Inputs"):
-        strainer_type = st.selectbox("Strainer Type", ["Y-type", "T-type", "Basket", "Cone"], key=f"type{i}")
-        pipe_id = st.number_input("Pipe ID (mm)", value=52.48, key=f"pipe{i}")
-        od = st.number_input("Screen OD (mm)", value=50.0, key=f"od{i}")
-        length = st.number_input("Screen Length (mm)", value=200.0, key=f"length{i}")
-        height = None
-        if strainer_type == "Cone":
-            height = st.number_input("Cone Height (mm)", value=100.0, key=f"height{i}")
-        mesh_pct = st.number_input("Mesh Open Area (%)", value=40.0, key=f"mesh{i}")
-        perf_pct = st.number_input("Perforated Open Area (%)", value=60.0, key=f"perf{i}")
-        flow = st.number_input("Flowrate (m³/hr)", value=10.0, key=f"flow{i}")
-        density = st.number_input("Density (kg/m³)", value=1000.0, key=f"density{i}")
-        viscosity = st.number_input("Viscosity (cP)", value=1.0, key=f"viscosity{i}")
-        K = st.slider("Loss Coefficient K", 0.5, 10.0, K_DEFAULT, step=0.1, key=f"K{i}")
-
-        alpha = (mesh_pct * perf_pct) / 10000
-        A_pipe = math.pi / 4 * (pipe_id / 1000) ** 2
-        A_screen = calculate_screen_area(strainer_type, od, length, height) * alpha
-        V_clean, V_clogged, dP_clean, dP_clogged = pressure_drop(A_pipe, A_screen, flow, density, K)
-
-        cases.append({
-            "Strainer Type": strainer_type,
-            "Pipe ID (mm)": pipe_id,
-            "Screen Area (m²)": round(A_screen, 6),
-            "Free Flow Ratio (Clean)": round(A_pipe / A_screen, 3),
-            "Free Flow Ratio (50% Clogged)": round(A_pipe / (A_screen / 2), 3),
-            "Velocity (Clean)": V_clean,
-            "Velocity (Clogged)": V_clogged,
-            "ΔP (Clean) [mbar]": dP_clean,
-            "ΔP (50% Clogged) [mbar]": dP_clogged,
-            "Flowrate (m³/hr)": flow
-        })
-
-if st.button("Generate Reports"):
-    df = pd.DataFrame(cases)
+
+# Results are filled column-wise and turned into one DataFrame after the inputs
+case_columns = {
+    "Strainer Type": np.empty(num_cases, dtype=object),
+    "Pipe ID (mm)": np.empty(num_cases),
+    "Screen Area (m²)": np.empty(num_cases),
+    "Free Flow Ratio (Clean)": np.empty(num_cases),
+    "Free Flow Ratio (50% Clogged)": np.empty(num_cases),
+    "Velocity (Clean)": np.empty(num_cases),
+    "Velocity (Clogged)": np.empty(num_cases),
+    "ΔP (Clean) [mbar]": np.empty(num_cases),
+    "ΔP (50% Clogged) [mbar]": np.empty(num_cases),
+    "Flowrate (m³/hr)": np.empty(num_cases),
+    "Density (kg/m³)": np.empty(num_cases),
+    "Loss Coefficient K": np.empty(num_cases),
+}
+
+# Inputs only commit on submit, instead of rerunning the script on every edit;
+# submitting also generates the reports from the values just entered
+with st.form("cases_form"):
+    for i in range(num_cases):
+        with st.expander(f"Case {i+1} Inputs"):
+            strainer_type = st.selectbox("Strainer Type", ["Y-type", "T-type", "Basket", "Cone"], key=f"type{i}")
+            pipe_id = st.number_input("Pipe ID (mm)", value=52.48, key=f"pipe{i}")
+            od = st.number_input("Screen OD (mm)", value=50.0, key=f"od{i}")
+            length = st.number_input("Screen Length (mm)", value=200.0, key=f"length{i}")
+            # Always shown, as widgets inside a form cannot react to the strainer type before submit
+            cone_height = st.number_input("Cone Height (mm)", value=100.0, key=f"height{i}", help="Used for Cone strainers only")
+            height = cone_height if strainer_type == "Cone" else None
+            mesh_pct = st.number_input("Mesh Open Area (%)", value=40.0, key=f"mesh{i}")
+            perf_pct = st.number_input("Perforated Open Area (%)", value=60.0, key=f"perf{i}")
+            flow = st.number_input("Flowrate (m³/hr)", value=10.0, key=f"flow{i}")
+            density = st.number_input("Density (kg/m³)", value=1000.0, key=f"density{i}")
+            viscosity = st.number_input("Viscosity (cP)", value=1.0, key=f"viscosity{i}")
+            K = st.slider("Loss Coefficient K", 0.5, 10.0, K_DEFAULT, step=0.1, key=f"K{i}")
+
+            alpha = (mesh_pct * perf_pct) / 10000
+            A_pipe = _PI_OVER_4 * pipe_id * pipe_id * _MM2_TO_M2
+            A_screen = calculate_screen_area(strainer_type, od, length, height) * alpha
+            V_clean, V_clogged, dP_clean, dP_clogged = pressure_drop(A_pipe, A_screen, flow, density, K)
+            free_flow_ratio = A_pipe / A_screen
+
+            case_columns["Strainer Type"][i] = strainer_type
+            case_columns["Pipe ID (mm)"][i] = pipe_id
+            case_columns["Screen Area (m²)"][i] = A_screen
+            case_columns["Free Flow Ratio (Clean)"][i] = free_flow_ratio
+            case_columns["Free Flow Ratio (50% Clogged)"][i] = 2 * free_flow_ratio
+            case_columns["Velocity (Clean)"][i] = V_clean
+            case_columns["Velocity (Clogged)"][i] = V_clogged
+            case_columns["ΔP (Clean) [mbar]"][i] = dP_clean
+            case_columns["ΔP (50% Clogged) [mbar]"][i] = dP_clogged
+            case_columns["Flowrate (m³/hr)"][i] = flow
+            case_columns["Density (kg/m³)"][i] = density
+            case_columns["Loss Coefficient K"][i] = K
+
+    submitted = st.form_submit_button("Generate Reports")
+
+cases = pd.DataFrame(case_columns, copy=False)
+
+if submitted:
+    # Hashable, order-preserving form of the rounded cases for the cached builders
+    # Density and K are carried on the cases only as graph inputs, not as report columns
+    report_df = cases.drop(columns=["Density (kg/m³)", "Loss Coefficient K"]).round(RESULT_DECIMALS)
+    cases_key = tuple(tuple(row.items()) for row in report_df.to_dict("records"))
+    plot_key = tuple(tuple(cases[col].tolist()) for col in ("Screen Area (m²)", "Density (kg/m³)", "Loss Coefficient K"))
+
+    # Rebuild the reports only when the cases differ from the last generated ones
+    report_key = blake2b(repr((cases_key, plot_key)).encode(), digest_size=16).hexdigest()
+    if st.session_state.get("report_key") != report_key:
+        st.session_state["xlsx"] = build_excel_bytes(cases_key)
+        # Plot graph, reused as-is in the PDF
+        st.session_state["graph_png"] = render_plot_png(plot_key)
+        st.session_state.pop("pdf", None)
+        st.session_state["report_key"] = report_key
+
+# Reports stay on the page across reruns, e.g. after clicking a download button
+if "report_key" in st.session_state:
     # Excel download
-    excel_buffer = io.BytesIO()
-    with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name="Results")
-    excel_buffer.seek(0)
-    st.download_button("Download Excel Report", data=excel_buffer, file_name="Strainer_Report.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    st.download_button("Download Excel Report", data=st.session_state["xlsx"], file_name="Strainer_Report.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
-    # Plot graph
-    flow_range = np.linspace(1, 20, 40)
-    fig, ax = plt.subplots()
-    for idx, case in enumerate(cases):
-        A = case["Screen Area (m²)"]
-        dp_values = [(2.5 * (1000 / 1000) * ((f / 3600 / A) * 100) ** 2) / (2 * GRAVITY) * 0.980665 for f in flow_range]
-        ax.plot(flow_range, dp_values, label=f"Case {idx+1}")
-    ax.set_xlabel("Flowrate (m³/hr)")
-    ax.set_ylabel("Pressure Drop (mbar)")
-    ax.set_title("Flow vs Pressure Drop")
-    ax.grid(True)
-    ax.legend()
-    st.pyplot(fig)
+    st.image(st.session_state["graph_png"])
 
-    # Save graph for PDF
-    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as graph_img:
-        fig.savefig(graph_img.name)
-        pdf_path = generate_pdf(cases, graph_img.name)
+    # PDF is built last so a failure here does not hide the Excel report and graph
+    if submitted and "pdf" not in st.session_state:
+        st.session_state["pdf"] = generate_pdf(cases_key, st.session_state["graph_png"])
 
     # PDF download
-    with open(pdf_path, "rb") as f:
-        st.download_button("Download PDF Report", data=f, file_name="Strainer_Report.pdf", mime="application/pdf")
+    if "pdf" in st.session_state:
+        st.download_button("Download PDF Report", data=st.session_state["pdf"], file_name="Strainer_Report.pdf", mime="application/pdf")